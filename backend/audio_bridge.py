@@ -1,18 +1,81 @@
 import os
 import io
 import wave
+import queue
+import struct
+import asyncio
+import tempfile
+import threading
 import pyttsx3
 import logging
+import numpy as np
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+# RAM-backed scratch dir for pyttsx3 output (tmpfs on Linux)
+_SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+TARGET_SAMPLE_RATE = 48000 # LiveKit's native rate
+
+# Canonical 44-byte PCM WAV header (RIFF + 16-byte fmt chunk + data chunk header)
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+_WavHeader = namedtuple("_WavHeader", (
+    "riff", "riff_size", "wave", "fmt", "fmt_size", "audio_format", "channels",
+    "rate", "byte_rate", "block_align", "bits", "data", "data_size"
+))
+
+def _parse_wav(wav_bytes):
+    """Returns (pcm, rate, channels, sampwidth); uses the wave module for non-canonical files."""
+    if len(wav_bytes) >= _WAV_HEADER.size:
+        hdr = _WavHeader._make(_WAV_HEADER.unpack_from(wav_bytes))
+        if (hdr.riff == b"RIFF" and hdr.wave == b"WAVE" and hdr.fmt == b"fmt "
+                and hdr.fmt_size == 16 and hdr.audio_format == 1 and hdr.data == b"data"):
+            end = _WAV_HEADER.size + hdr.data_size
+            return wav_bytes[_WAV_HEADER.size:end], hdr.rate, hdr.channels, hdr.bits // 8
+
+    # Extra chunks (e.g. SAPI5 "fact"/"LIST") - let the wave module walk them
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wf:
+        return wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+
+def _resample_pcm16(pcm_data, src_rate, channels, dst_rate=TARGET_SAMPLE_RATE):
+    """
+    Converts interleaved 16-bit PCM to mono at dst_rate.
+    Linear interpolation, vectorised in NumPy - adequate for TTS speech.
+    """
+    x = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32)
+    if channels > 1:
+        x = x.reshape(-1, channels).mean(axis=1)
+    if src_rate != dst_rate and len(x):
+        n_out = int(round(len(x) * dst_rate / src_rate))
+        t = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+        x = np.interp(t, np.arange(len(x)), x)
+    return np.clip(np.rint(x), -32768, 32767).astype(np.int16).tobytes()
 
 class BackendAudioBridge:
+    _MAX = 64 # Max cached utterances
+
     def __init__(self):
+        # Recently spoken utterances (system prompts, repeated echoes) -> PCM bytes
+        self._pcm_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # pyttsx3 is not thread-safe and runAndWait() blocks, so the engine lives
+        # on its own daemon thread and is fed (text, Future) jobs.
+        self.engine = None
+        self._jobs = queue.Queue()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_engine, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _init_engine(self):
         # Initialize engine
         # Note: pyttsx3 initialization might fail in some headless environments without audio drivers
         try:
             self.engine = pyttsx3.init()
             self.engine.setProperty('rate', 160) # Speed
             self.engine.setProperty('volume', 1.0)
-            
+
             # Select a voice (Preferably Windows built-in David or Zira)
             voices = self.engine.getProperty('voices')
             if voices:
@@ -21,41 +84,95 @@ class BackendAudioBridge:
             logging.error(f"Failed to init pyttsx3: {e}")
             self.engine = None
 
+    def _run_engine(self, ready):
+        """Worker thread: owns the pyttsx3 engine and serves synthesis jobs."""
+        # Init on this thread so SAPI5's COM apartment matches the caller of runAndWait()
+        self._init_engine()
+        ready.set()
+
+        while True:
+            text, fut = self._jobs.get()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            fut.set_result(self._synthesize(text))
+
     def generate_pcm(self, text):
         """
         Generates 16-bit 48kHz PCM audio bytes from text using pyttsx3 (SAPI5).
+        Blocks until the TTS worker is done; use generate_pcm_async from the event loop.
         """
         if not text or not self.engine:
             return None
-            
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+        return self._cache_put(text, self._submit(text).result())
+
+    async def generate_pcm_async(self, text):
+        """
+        Same as generate_pcm, but awaits the TTS worker instead of blocking the event loop.
+        """
+        if not text or not self.engine:
+            return None
+        cached = self._cache_get(text)
+        if cached is not None:
+            return cached
+        pcm_data = await asyncio.wrap_future(self._submit(text))
+        return self._cache_put(text, pcm_data)
+
+    def _submit(self, text):
+        fut = Future()
+        self._jobs.put((text, fut))
+        return fut
+
+    def _cache_get(self, text):
+        key = text.strip().lower()
+        with self._cache_lock:
+            if key in self._pcm_cache:
+                self._pcm_cache.move_to_end(key)
+                return self._pcm_cache[key]
+        return None
+
+    def _cache_put(self, text, pcm_data):
+        if pcm_data:
+            with self._cache_lock:
+                self._pcm_cache[text.strip().lower()] = pcm_data
+                if len(self._pcm_cache) > self._MAX:
+                    self._pcm_cache.popitem(last=False)
+        return pcm_data
+
+    def _synthesize(self, text):
+        """Runs pyttsx3 into a RAM-backed temp WAV and returns 48kHz mono PCM."""
+        temp_file = None
         try:
-            # Save to temporary WAV file
-            temp_file = "temp_output.wav"
-            # pyttsx3 save_to_file runs in the event loop.
-            # We must runAndWait() to process it.
+            # pyttsx3 can only render to a path, so keep that path on tmpfs.
+            with tempfile.NamedTemporaryFile(dir=_SCRATCH_DIR, suffix=".wav", delete=False) as tmp:
+                temp_file = tmp.name
+            # pyttsx3 save_to_file runs in the engine's own loop.
+            # runAndWait() blocks, but only this worker thread.
             self.engine.save_to_file(text, temp_file)
             self.engine.runAndWait()
-            
-            # Read WAV bytes
-            pcm_data = None
-            if os.path.exists(temp_file):
-                with wave.open(temp_file, 'rb') as wf:
-                    # LiveKit expects 48kHz usually, but SAPI5 might output 22k or 44k.
-                    # We send what we have. If LiveKit negotiates Opus it handles resampling?
-                    # Or we might need to resample.
-                    # For now, let's just read frames.
-                    pcm_data = wf.readframes(wf.getnframes())
-                    
-                    # Log params
-                    channels = wf.getnchannels()
-                    rate = wf.getframerate()
-                    width = wf.getsampwidth() 
-                    logging.info(f"Generated Audio: {rate}Hz, {channels}ch, {width}bytes width")
-
-                # Clean up
-                os.remove(temp_file)
-            
+
+            # Read the whole file in one go and parse the WAV from memory
+            with open(temp_file, 'rb') as f:
+                wav_bytes = f.read()
+            if not wav_bytes:
+                return None
+
+            pcm_data, rate, channels, width = _parse_wav(wav_bytes)
+            logging.info(f"Generated Audio: {rate}Hz, {channels}ch, {width}bytes width")
+
+            # SAPI5 typically emits 22.05k/44.1k; LiveKit wants 48k mono
+            if width != 2:
+                logging.warning(f"Unsupported sample width {width}; sending audio as-is")
+            elif rate != TARGET_SAMPLE_RATE or channels != 1:
+                pcm_data = _resample_pcm16(pcm_data, rate, channels)
+
             return pcm_data
         except Exception as e:
             logging.error(f"TTS Conversion Error: {e}")
             return None
+        finally:
+            # Clean up
+            if temp_file and os.path.exists(temp_file):
+                os.remove(temp_file)
@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from collections import deque
 from backend.database_manager import DatabaseManager
 from backend.vision_processor import VisionProcessor
 from backend.voice_bridge_client import VoiceBridgeClient
@@ -8,6 +10,13 @@ from dotenv import load_dotenv
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - Savant Manager - %(message)s')
 
+VISION_TIMEOUT = 5.0 # Seconds before a visual query is abandoned
+
+DEBOUNCE_SECONDS = 0.3 # Silence after the last partial transcription before acting on it
+TERMINAL_PUNCTUATION = ('.', '?', '!')
+
+HISTORY_MAX = 200 # Transcript entries kept in memory; older turns are dropped
+
 class ConversationManager:
     def __init__(self):
         self.db = DatabaseManager()
@@ -17,21 +26,88 @@ class ConversationManager:
         self.active_protocol = None
         self.current_step_id = None
         self.conversation_active = False
-        self.history = [] # List of {"role": "user/assistant", "content": "..."}
+        self.history = deque(maxlen=HISTORY_MAX) # {"role": "user/assistant", "content": "..."}
+
+        # Partial STT hypotheses are coalesced before hitting process_input:
+        # segment id -> latest hypothesis for that segment, in arrival order
+        self._segments = {}
+        self._debounce_handle = None
+        self._flush_task = None
+        self._flush_lock = None # asyncio.Lock, created on the event loop (see _flush)
         
         # Link Voice Bridge Input (Text Data) to Process Logic
-        self.voice_bridge.set_on_message(self.process_input)
-        logging.info(f"✓ ConversationManager initialized. Callback wired to process_input.")
+        self.voice_bridge.set_on_message(self.on_partial_text)
+        logging.info(f"✓ ConversationManager initialized. Callback wired to on_partial_text.")
 
+    async def on_partial_text(self, text, segment_id=None, final=False):
+        """
+        Buffers streaming transcriptions and runs process_input once the speaker
+        pauses for DEBOUNCE_SECONDS or a segment is final. Interim updates replace
+        the text of their segment; untagged text replaces the whole pending hypothesis
+        and, having no final flag, also flushes on terminal punctuation.
+        """
+        text = text.strip() if text else ""
+        if not text:
+            return
 
+        if segment_id is None:
+            self._segments.clear()
+        self._segments[segment_id] = text
+
+        if self._debounce_handle:
+            self._debounce_handle.cancel()
+            self._debounce_handle = None
+
+        # Tagged interim text may end in punctuation and still be revised, so only
+        # untagged text uses punctuation as an end-of-utterance hint
+        if final or (segment_id is None and text.endswith(TERMINAL_PUNCTUATION)):
+            await self._flush()
+        else:
+            loop = asyncio.get_running_loop()
+            self._debounce_handle = loop.call_later(DEBOUNCE_SECONDS, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._debounce_handle = None
+        self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        text = " ".join(self._segments.values())
+        self._segments.clear()
+        if not text:
+            return
+        if self._flush_lock is None:
+            # __init__ runs on Streamlit's script thread, which has no event loop
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            try:
+                await self.process_input(text)
+            except Exception as e:
+                logging.error(f"Failed to process input: {e}", exc_info=True)
+
+    async def close(self):
+        """Flushes pending DB writes and releases backend resources."""
+        if self._debounce_handle:
+            self._debounce_handle.cancel()
+            self._debounce_handle = None
+        if self.vision:
+            await self.vision.close()
+        if self.db:
+            await self.db.close()
+
+    def _remember(self, role, content):
+        """Appends a turn to the bounded transcript."""
+        self.history.append({"role": role, "content": content})
+
+    def clear_history(self):
+        self.history.clear()
 
     async def _speak_and_return(self, text):
         """Helper to stream audio and return text."""
         # Append to History
-        self.history.append({"role": "assistant", "content": text})
+        self._remember("assistant", text)
 
         if self.voice_bridge.source:
-            pcm = self.audio.generate_pcm(text)
+            pcm = await self.audio.generate_pcm_async(text)
             if pcm:
                 await self.voice_bridge.send_audio(pcm)
         return text
@@ -54,17 +130,23 @@ class ConversationManager:
         
         # Append to history
         if user_text:
-            self.history.append({"role": "user", "content": user_text})
+            self._remember("user", user_text)
             logging.info(f"Appended User Input. History Size: {len(self.history)}")
         elif image_bytes:
-             self.history.append({"role": "user", "content": "📸 [Image Analysis]"})
+             self._remember("user", "📸 [Image Analysis]")
 
         visual_context = ""
         
         # 1. Analyze Image if provided (DISABLED IN ECHO MODE)
         if image_bytes and self.vision:
             logging.info("Processing visual input...")
-            analysis = self.vision.analyze_injury(image_bytes)
+            try:
+                analysis = await asyncio.wait_for(
+                    self.vision.analyze_injury_async(image_bytes), VISION_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                logging.warning("Visual analysis timed out.")
+                analysis = {}
             injury = analysis.get("injury", "Unknown")
             severity = analysis.get("severity", "Unknown")
             visual_context = f"[Visual Info: Found {injury}, Severity: {severity}]"
@@ -94,7 +176,7 @@ class ConversationManager:
              # This requires an event loop. 
              # For this prototype, we assume the Voice Bridge is running in parallel or we log the intent.
              logging.info(f"Sending context to LiveKit: {final_input}")
-             # task = asyncio.create_task(self.voice_bridge.publish_context(final_input))
+             # One reliable packet per turn; visual findings are already folded into final_input
              await self.voice_bridge.publish_context(final_input)
         else:
              logging.warning("Voice Bridge not connected. Context not sent to remote agent.")
@@ -1,30 +1,154 @@
 import os
+import asyncio
 import logging
-from tinydb import TinyDB
+import sqlite3
+import threading
 from datetime import datetime
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - Savant DB - %(message)s')
 
-DB_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'patient_logs.json')
+DB_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'patient_logs.sqlite')
+
+_SCHEMA = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+CREATE TABLE IF NOT EXISTS patient_state(
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    heart_rate TEXT,
+    injury_detected TEXT,
+    actions_taken TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_patient_state_ts ON patient_state(timestamp);
+"""
+
+_INSERT_SQL = (
+    "INSERT INTO patient_state(timestamp, heart_rate, injury_detected, actions_taken) "
+    "VALUES (?, ?, ?, ?)"
+)
+
+FLUSH_BATCH = 64 # Max rows per transaction
+FLUSH_INTERVAL = 0.25 # Seconds between flushes
 
 class DatabaseManager:
     def __init__(self):
-        self.patient_db = TinyDB(DB_FILE)
+        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+        # Append-only log: autocommit, WAL journal, shared with the LiveKit thread
+        self.conn = sqlite3.connect(DB_FILE, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+        self._write_lock = threading.Lock() # Batches may commit from a worker thread
+
+        # Rows logged from inside the event loop are batched by a flusher task.
+        # The queue is created by start() on that loop: __init__ may run on a thread
+        # without one (e.g. Streamlit's script thread).
+        self._log_q = None
+        self._loop = None
+        self._flusher_task = None
         logging.info("✓ DatabaseManager initialized (RAG disabled)")
 
     def log_patient_state(self, heart_rate, injury_detected, actions_taken):
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "heart_rate": heart_rate,
-            "injury_detected": injury_detected,
-            "actions_taken": actions_taken
-        }
-        self.patient_db.insert(entry)
-        logging.info("Patient state logged.")
-
-    def get_logs(self):
-        return self.patient_db.all()
+        row = (
+            datetime.now().isoformat(),
+            str(heart_rate),
+            injury_detected,
+            actions_taken
+        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or (self._loop is not None and loop is not self._loop):
+            # No event loop (scripts, CLI) or not the flusher's loop: write through
+            self._write_rows([row])
+            return
+        self.start()
+        self._log_q.put_nowait(row)
+
+    def start(self):
+        """Starts the background flusher on the running event loop."""
+        if self._flusher_task is None:
+            self._loop = asyncio.get_running_loop()
+            self._log_q = asyncio.Queue()
+            self._flusher_task = self._loop.create_task(self._flusher())
+
+    async def _flusher(self):
+        try:
+            while True:
+                rows = [await self._log_q.get()]
+                try:
+                    # SQLite commit happens off the event loop
+                    await asyncio.to_thread(self._write_rows, rows + self._drain(FLUSH_BATCH - 1))
+                except Exception as e:
+                    logging.error(f"Failed to flush patient log: {e}")
+                await asyncio.sleep(FLUSH_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+
+    def _drain(self, limit=None):
+        """Pops queued rows; must run on the flusher's loop (asyncio.Queue is not thread-safe)."""
+        rows = []
+        if self._log_q is None:
+            return rows
+        while limit is None or len(rows) < limit:
+            try:
+                rows.append(self._log_q.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    def _write_rows(self, rows):
+        if not rows:
+            return
+        # One transaction (and one WAL sync) per batch
+        with self._write_lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(_INSERT_SQL, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        logging.info(f"Patient state logged ({len(rows)} entries).")
+
+    async def _drain_async(self):
+        return self._drain()
+
+    def _flush_pending(self):
+        """Writes queued rows now. Safe from any thread: the queue is drained on its own loop."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop or not loop.is_running():
+            rows = self._drain()
+        else:
+            rows = asyncio.run_coroutine_threadsafe(self._drain_async(), loop).result()
+        self._write_rows(rows)
+
+    async def close(self):
+        """Stops the flusher and writes any queued entries (call on the flusher's loop)."""
+        if self._flusher_task:
+            self._flusher_task.cancel()
+            await asyncio.gather(self._flusher_task, return_exceptions=True)
+            self._flusher_task = None
+        self._write_rows(self._drain())
+        self._log_q = None
+        self._loop = None
+
+    def get_logs(self, since=None):
+        """Returns logged entries (optionally only those at/after an ISO timestamp) as dicts."""
+        self._flush_pending()
+        query = "SELECT timestamp, heart_rate, injury_detected, actions_taken FROM patient_state"
+        params = ()
+        if since:
+            query += " WHERE timestamp >= ?"
+            params = (since,)
+        return [dict(row) for row in self.conn.execute(query + " ORDER BY id", params)]
 
 if __name__ == "__main__":
     db = DatabaseManager()
@@ -1,8 +1,11 @@
 import os
+import io
 import base64
-import json
+import orjson
+import asyncio
 import logging
-from openai import OpenAI
+import httpx
+from PIL import Image
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +13,45 @@ load_dotenv()
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - Savant Vision - %(message)s')
 
+MAX_IMAGE_SIDE = 1024 # Vision model gains nothing from larger frames
+JPEG_QUALITY = 80
+
+PROMPT = (
+    "You are an AI Savant. Analyze this emergency image. "
+    "Output strictly JSON: {'injury': '...', 'severity': 'CRITICAL', "
+    "'visual_overlay': 'Arterial Bleed - Apply Tourniquet'}."
+)
+
+# Reused verbatim on every call so the request prefix stays byte-identical
+_PROMPT_BLOCK = {"type": "text", "text": PROMPT}
+
+# Fallback for demo purposes if the API fails or returns unusable JSON
+_FALLBACK_ANALYSIS = {
+    "injury_type": "Unknown",
+    "severity": "Unknown",
+    "visual_overlay_text": "Analysis Failed - Check Connection"
+}
+
+def _downscale_jpeg(image_bytes):
+    """Shrinks oversized frames to MAX_IMAGE_SIDE and re-encodes as JPEG."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if max(img.size) <= MAX_IMAGE_SIDE and img.format == "JPEG":
+                return image_bytes
+            img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, format="JPEG", quality=JPEG_QUALITY)
+            return buf.getvalue()
+    except Exception as e:
+        logging.warning(f"Image downscale skipped: {e}")
+        return image_bytes
+
+def _jpeg_data_url(image_bytes):
+    """Builds the base64 data URL in one buffer (no intermediate decoded str)."""
+    buf = bytearray(b"data:image/jpeg;base64,")
+    buf += base64.b64encode(image_bytes)
+    return buf.decode("ascii")
+
 class VisionProcessor:
     def __init__(self):
         self.api_key = os.getenv('NIM_API_KEY')
@@ -19,62 +61,65 @@ class VisionProcessor:
         if not self.api_key:
             logging.warning("NIM_API_KEY not found. Vision calls will fail.")
         
-        self.client = OpenAI(
+        # Pooled async client: keeps TCP+TLS sessions warm across calls
+        self._client = httpx.AsyncClient(
             base_url=self.base_url,
-            api_key=self.api_key or "dummy_key"
+            headers={"Authorization": f"Bearer {self.api_key or 'dummy_key'}"},
+            limits=httpx.Limits(max_keepalive_connections=8),
+            timeout=10.0
         )
 
-    def analyze_injury(self, image_bytes):
+        # Constant request fields; only the image slot changes per call
+        self._request_base = {
+            "model": self.model,
+            "temperature": 0.2,
+            "top_p": 0.7,
+            "max_tokens": 1024,
+            "stream": False
+        }
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def analyze_injury_async(self, image_bytes):
         """
-        Analyzes an injury image using NVIDIA NIM.
+        Analyzes an injury image using NVIDIA NIM without blocking the event loop.
         Returns a structured JSON dictionary.
         """
         logging.info("Analyzing injury image...")
         
-        # Encode image to base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-        
-        prompt = (
-            "You are an AI Savant. Analyze this emergency image. "
-            "Output strictly JSON: {'injury': '...', 'severity': 'CRITICAL', "
-            "'visual_overlay': 'Arterial Bleed - Apply Tourniquet'}."
-        )
-
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            # Downscale, then encode image to a base64 data URL (CPU work, off the loop)
+            image_url = await asyncio.to_thread(lambda: _jpeg_data_url(_downscale_jpeg(image_bytes)))
+
+            payload = {
+                "messages": [
                     {
                         "role": "user",
                         "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
+                            _PROMPT_BLOCK,
+                            {"type": "image_url", "image_url": {"url": image_url}}
                         ]
                     }
                 ],
-                temperature=0.2,
-                top_p=0.7,
-                max_tokens=1024,
-                stream=False
-            )
+                **self._request_base
+            }
+            response = await self._client.post("/chat/completions", json=payload)
+            response.raise_for_status()
             
-            content = response.choices[0].message.content
+            content = orjson.loads(response.content)["choices"][0]["message"]["content"].strip()
             # Clean up markdown code blocks if present
-            if "```json" in content:
-                content = content.replace("```json", "").replace("```", "")
+            if content.startswith("```"):
+                content = content.split("```", 2)[1].removeprefix("json").strip()
             
-            return json.loads(content)
+            analysis = orjson.loads(content)
+            if not isinstance(analysis, dict):
+                raise orjson.JSONDecodeError("expected a JSON object", content, 0)
+            return analysis
 
+        except orjson.JSONDecodeError as e:
+            logging.error(f"Vision analysis returned invalid/truncated JSON: {e}")
+            return dict(_FALLBACK_ANALYSIS)
         except Exception as e:
             logging.error(f"Vision analysis failed: {e}")
-            # Fallback for demo purposes if API fails
-            return {
-                "injury_type": "Unknown",
-                "severity": "Unknown",
-                "visual_overlay_text": "Analysis Failed - Check Connection"
-            }
+            return dict(_FALLBACK_ANALYSIS)
@@ -2,25 +2,65 @@ import asyncio
 import requests
 import os
 import logging
-import json
+import orjson
+import functools
 import sounddevice as sd
 import numpy as np
 from livekit import rtc
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - Savant VoiceBridge - %(message)s')
 
+MIC_BLOCK = 2048 # Frames per mic callback
+MIC_BLOCK_BYTES = MIC_BLOCK * 2 # Mono int16
+MIC_SLABS = 8 # Blocks of headroom before the capture callback laps the consumer
+TTS_SAMPLE_RATE = 48000
+TTS_FRAME_SAMPLES = 960 # 20 ms at 48 kHz, matching Opus framing
+TTS_FRAME_BYTES = TTS_FRAME_SAMPLES * 2 # Mono int16
+_SILENCE = memoryview(bytes(TTS_FRAME_BYTES))
+INBOX_SIZE = 32 # Pending transcriptions before the oldest are dropped
+CONTEXT_CACHE_MAX_CHARS = 16 * 1024 # Longer contexts bypass the encode cache (<= 64 KiB of utf-8 each)
+
+def _encode_utf8(text):
+    return text.encode('utf-8')
+
 class VoiceBridgeClient:
     def __init__(self):
         self.api_url = "https://vocalbridgeai.com/api/v1/token"
         self.api_key = os.getenv('VOCAL_BRIDGE_KEY')
+        # Keep-alive session: token refreshes reuse the TCP+TLS connection
+        self._http = requests.Session()
+        self._http.headers.update({
+            "X-API-Key": self.api_key or "",
+            "Content-Type": "application/json"
+        })
         self.room = None
         self.source = None
         self.track = None
-        self.on_message_callback = None # Function(text)
+        self.on_message_callback = None # Function(text, segment_id=None, final=False)
         self.disconnect_signal = None # Future for signalling reconnect
         self._audio_stream_task = None
         self._mic_task = None
 
+        # Incoming text is serialized through one worker (process_input is not re-entrant)
+        self._inbox = None # asyncio.Queue, created on the streaming loop
+        self._inbox_task = None
+
+        # Preallocated mic slabs: written by the sounddevice thread, read by the loop
+        self._slabs = [memoryview(bytearray(MIC_BLOCK_BYTES)) for _ in range(MIC_SLABS)]
+        self._slab_w = 0
+
+        # Scratch frame for the zero-padded tail of an utterance
+        self._tts_tail = memoryview(bytearray(TTS_FRAME_BYTES))
+
+        # Audio callback over/underrun counters (logged from the loop, never the callback)
+        self._input_xrun = 0
+        self._output_xrun = 0
+        self._xrun_task = None
+
+        # Memoized utf-8 encodings of recently published context strings
+        self._ctx_cache = functools.lru_cache(maxsize=128)(_encode_utf8)
+        self._last_large_ctx = (None, None) # (text, bytes) for oversized contexts
+
     def set_on_message(self, callback):
         self.on_message_callback = callback
     
@@ -29,17 +69,11 @@ class VoiceBridgeClient:
         if not self.api_key:
             logging.error("VOCAL_BRIDGE_KEY is missing.")
             return None
-            
-        headers = {
-            "X-API-Key": self.api_key,
-            "Content-Type": "application/json"
-        }
         
         try:
             # self.api_url already includes /api/v1/token
-            response = requests.post(
+            response = self._http.post(
                 self.api_url,
-                headers=headers,
                 json={"participant_name": "TheSavant"},
                 timeout=10
             )
@@ -52,37 +86,53 @@ class VoiceBridgeClient:
     def _on_data_received(self, data: rtc.DataPacket):
         """Has incoming data packets."""
         try:
-            # Handle transcription packets explicitly
+            # Handle transcription packets explicitly (JSON parsed straight from bytes)
             if data.topic == "lk.transcription":
                 try:
-                    text = data.data.decode('utf-8')
-                    # Could be JSON or raw text depending on agent implementation
-                    if text.startswith('{') and 'text' in text:
-                        import json
-                        obj = json.loads(text)
-                        text = obj.get('text', text)
-                    
-                    self._process_text_message(text, "transcription_packet")
+                    obj = orjson.loads(data.data)
+                except orjson.JSONDecodeError:
+                    obj = None
+                text = obj.get('text') if isinstance(obj, dict) else None
+                if text:
+                    # Segment metadata lets the consumer replace interim hypotheses in place
+                    self._process_text_message(
+                        text, "transcription_packet",
+                        segment_id=obj.get('segment_id') or obj.get('id'),
+                        final=bool(obj.get('final'))
+                    )
                     return
-                except:
-                    pass
 
             # Accept ALL topics for robustness (fallback)
-            text = data.data.decode('utf-8')
+            text = data.data.decode('utf-8', errors='replace')
             self._process_text_message(text, data.topic)
             
         except Exception as e:
             logging.warning(f"Failed to decode msg: {e}")
 
-    def _process_text_message(self, text, source):
+    def _process_text_message(self, text, source, segment_id=None, final=False):
         if text and text.strip():
             logging.info(f"Message from {source}: {text}")
-            if self.on_message_callback:
-                asyncio.create_task(self._safe_callback_run(text))
+            self._enqueue_message(text, segment_id, final)
+
+    def _enqueue_message(self, text, segment_id=None, final=False):
+        if not self.on_message_callback or self._inbox is None:
+            return
+        item = (text, segment_id, final)
+        try:
+            self._inbox.put_nowait(item)
+        except asyncio.QueueFull:
+            # Drop the oldest pending message to make room
+            self._inbox.get_nowait()
+            self._inbox.put_nowait(item)
 
-    async def _safe_callback_run(self, text):
+    async def _inbox_worker(self):
+        while True:
+            text, segment_id, final = await self._inbox.get()
+            await self._safe_callback_run(text, segment_id, final)
+
+    async def _safe_callback_run(self, text, segment_id=None, final=False):
         try:
-            await self.on_message_callback(text)
+            await self.on_message_callback(text, segment_id=segment_id, final=final)
         except Exception as e:
             logging.error(f"Callback Execution Failed: {e}", exc_info=True)
 
@@ -101,18 +151,38 @@ class VoiceBridgeClient:
             
             # transcription is already a list of segment objects
             if isinstance(transcription, list):
-                full_text = " ".join([seg.text for seg in transcription if hasattr(seg, 'text')])
+                # One message per segment so interim updates replace, rather than extend, their segment
+                for seg in transcription:
+                    text = getattr(seg, 'text', None)
+                    if text and text.strip():
+                        logging.info(f"Transcription: {text}")
+                        self._enqueue_message(text, getattr(seg, 'id', None), bool(getattr(seg, 'final', False)))
             else:
                 # Fallback if it's a different structure
                 full_text = str(transcription)
-            
-            if full_text.strip():
-                logging.info(f"Transcription: {full_text}")
-                if self.on_message_callback:
-                    asyncio.create_task(self._safe_callback_run(full_text))
+                if full_text.strip():
+                    logging.info(f"Transcription: {full_text}")
+                    self._enqueue_message(full_text)
         except Exception as e:
             logging.warning(f"Failed to process transcription: {e}")
 
+    def _start_xrun_logger(self):
+        """Starts the xrun reporter; called only by loops that actually open a PortAudio stream."""
+        if not self._xrun_task:
+            self._xrun_task = asyncio.create_task(self._xrun_logger())
+
+    async def _xrun_logger(self, interval=1.0):
+        """Reports audio callback xruns at most once per interval."""
+        seen_in, seen_out = self._input_xrun, self._output_xrun
+        while True:
+            await asyncio.sleep(interval)
+            new_in = self._input_xrun - seen_in
+            new_out = self._output_xrun - seen_out
+            if new_in or new_out:
+                logging.warning(f"Audio xruns in last {interval:.0f}s: input={new_in}, output={new_out}")
+            seen_in += new_in
+            seen_out += new_out
+
     async def _mic_capture_loop(self, source):
         """Captures mic via sounddevice and pushes to LiveKit source"""
         SAMPLE_RATE = 48000
@@ -121,30 +191,34 @@ class VoiceBridgeClient:
         logging.info("Starting Microphone Capture...")
         
         loop = asyncio.get_event_loop()
-        queue = asyncio.Queue()
+        queue = asyncio.Queue() # (slab, nbytes) ready to send
 
         def callback(indata, frames, time, status):
             if status:
-                print(status)
-            loop.call_soon_threadsafe(queue.put_nowait, indata.copy())
+                self._input_xrun += 1
+            # indata is a raw cffi buffer of int16 bytes; copy it straight into a slab
+            slot = self._slab_w % MIC_SLABS
+            nbytes = len(indata)
+            self._slabs[slot][:nbytes] = indata
+            self._slab_w += 1
+            loop.call_soon_threadsafe(queue.put_nowait, (slot, nbytes))
 
+        self._start_xrun_logger()
         try:
             # Open Input Stream
             # High blocksize reduces CPU interruptions. 'low' latency is usually fine but 'high' is safer vs overflow.
-            with sd.InputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16', 
-                                callback=callback, blocksize=2048, latency='high'):
+            with sd.RawInputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16', 
+                                   callback=callback, blocksize=MIC_BLOCK, latency='high'):
                  while True:
-                    indata = await queue.get()
-                    # Convert raw bytes to frame
-                    # indata is numpy array (frames, channels) of int16
-                    # tobytes() gives raw PCM
-                    frame_data = indata.tobytes()
-                    
+                    slot, nbytes = await queue.get()
+                    # Hand LiveKit a view of the slab (no intermediate copy)
+                    frame_data = self._slabs[slot][:nbytes]
+
                     frame = rtc.AudioFrame(
                         data=frame_data,
                         sample_rate=SAMPLE_RATE,
                         num_channels=CHANNELS,
-                        samples_per_channel=len(indata) # indata length is frames
+                        samples_per_channel=nbytes // (2 * CHANNELS)
                     )
                     await source.capture_frame(frame)
         except asyncio.CancelledError:
@@ -164,7 +238,7 @@ class VoiceBridgeClient:
         
         def callback(outdata, frames, time, status):
             if status:
-                print(status)
+                self._output_xrun += 1
             try:
                 data = queue.get_nowait()
                 # Ensure size matches
@@ -179,6 +253,7 @@ class VoiceBridgeClient:
         # Simpler approach: Blocking write in async executor or just simple stream write
         # Logic: LiveKit stream yields frames. We write to stream.
         
+        self._start_xrun_logger()
         try:
             with sd.OutputStream(samplerate=SAMPLE_RATE, channels=CHANNELS, dtype='int16') as stream:
                 async for event in audio_stream:
@@ -188,7 +263,8 @@ class VoiceBridgeClient:
                     # Convert from frame (AudioFrame)
                     # frame.data returns memoryview/bytes
                     data = np.frombuffer(frame.data, dtype=np.int16)
-                    stream.write(data)
+                    # PortAudio's blocking write would stall the loop; run it on a worker thread
+                    await asyncio.to_thread(stream.write, data)
         except asyncio.CancelledError:
             logging.info("Audio play loop cancelled")
         except Exception as e:
@@ -201,6 +277,12 @@ class VoiceBridgeClient:
             self._mic_task.cancel()
         if self._audio_stream_task:
             self._audio_stream_task.cancel()
+        if self._inbox_task:
+            self._inbox_task.cancel()
+            self._inbox_task = None
+        if self._xrun_task:
+            self._xrun_task.cancel()
+            self._xrun_task = None
         
         if self.room:
             await self.room.disconnect()
@@ -211,7 +293,8 @@ class VoiceBridgeClient:
         self.track = None
 
 
-
+    # Hybrid Mode: these stubs shadow the sounddevice loops above, so the browser
+    # owns mic and speaker and the xrun counters/logger stay idle.
     async def _mic_capture_loop(self, source):
         """Disabled for Hybrid Mode"""
         pass
@@ -223,14 +306,22 @@ class VoiceBridgeClient:
              pass
 
     async def connect_and_stream(self):
-        """Connects and maintains call (Passive/Data Mode)."""
+        """
+        Connects and maintains call (Passive/Data Mode).
+
+        Everything scheduled on this loop must stay non-blocking: use await asyncio.sleep
+        (never time.sleep) and push blocking IO / CPU-heavy audio work through asyncio.to_thread.
+        """
         try:
-            token_data = self.get_token()
+            token_data = await asyncio.to_thread(self.get_token)
             if not token_data: return
 
             logging.info(f"Connecting to room: {token_data.get('room_name')}")
             
             self.room = rtc.Room()
+            if not self._inbox_task:
+                self._inbox = asyncio.Queue(maxsize=INBOX_SIZE)
+                self._inbox_task = asyncio.create_task(self._inbox_worker())
 
             # Set up event handlers
             @self.room.on("track_subscribed")
@@ -273,7 +364,46 @@ class VoiceBridgeClient:
 
     async def reconnect(self): pass
 
-    async def send_audio(self, p): pass
+    async def send_audio(self, pcm):
+        """
+        Streams 48kHz mono int16 PCM into the published source in 20 ms frames.
+        Frames are views into pcm; only the final partial frame is copied (and zero-padded).
+        """
+        if not self.source or not pcm:
+            return
+
+        mv = memoryview(pcm)
+        full = len(mv) - len(mv) % TTS_FRAME_BYTES
+        try:
+            for off in range(0, full, TTS_FRAME_BYTES):
+                await self.source.capture_frame(self._tts_frame(mv[off:off + TTS_FRAME_BYTES]))
+            if full < len(mv):
+                rem = len(mv) - full
+                self._tts_tail[:rem] = mv[full:]
+                self._tts_tail[rem:] = _SILENCE[rem:]
+                await self.source.capture_frame(self._tts_frame(self._tts_tail))
+        except Exception as e:
+            logging.error(f"Failed to send audio: {e}")
+
+    @staticmethod
+    def _tts_frame(data):
+        return rtc.AudioFrame(
+            data=data,
+            sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1,
+            samples_per_channel=TTS_FRAME_SAMPLES
+        )
+
+    def _encode_context(self, text_context):
+        if len(text_context) <= CONTEXT_CACHE_MAX_CHARS:
+            return self._ctx_cache(text_context)
+        # Don't pin large payloads in the LRU; just reuse the last one if it repeats
+        last_text, last_data = self._last_large_ctx
+        if text_context is last_text or text_context == last_text:
+            return last_data
+        data = text_context.encode('utf-8')
+        self._last_large_ctx = (text_context, data)
+        return data
 
     async def publish_context(self, text_context):
         """
@@ -284,7 +414,7 @@ class VoiceBridgeClient:
             return
 
         try:
-            data = text_context.encode('utf-8')
+            data = self._encode_context(text_context)
             await self.room.local_participant.publish_data(data, reliable=True)
             logging.info(f"Published context: {text_context[:50]}...")
         except Exception as e:
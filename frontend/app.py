@@ -8,6 +8,8 @@ import sys
 import os
 import threading
 import asyncio
+import string
+import functools
 
 # Add parent directory to path for backend imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -86,34 +88,163 @@ def get_manager():
 
 manager = get_manager()
 
+@st.cache_resource
+def get_event_loop():
+    """One long-lived asyncio loop (on a daemon thread) for all LiveKit work."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+LOG_TAIL = 50 # Most recent messages rendered in the conversation log
+LOG_REFRESH = 0.5 # Seconds between conversation log polls while a call is active
+
+# LiveKit browser client, templated once. Identical markup across reruns lets
+# Streamlit keep the existing iframe (and its WebRTC session) mounted.
+_LIVEKIT_HTML = string.Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <script src="https://cdn.jsdelivr.net/npm/livekit-client@2/dist/livekit-client.umd.min.js"></script>
+    <style>
+        body { 
+            font-family: 'Courier New', monospace; 
+            text-align: center; 
+            padding: 30px; 
+            background: linear-gradient(135deg, #001400 0%, #002800 100%);
+            color: #39FF14;
+            margin: 0;
+        }
+        #status { 
+            font-size: 22px; 
+            font-weight: bold; 
+            margin: 20px 0;
+            padding: 20px;
+            border: 3px solid #39FF14;
+            border-radius: 15px;
+            background: rgba(0, 50, 0, 0.5);
+            box-shadow: 0 0 25px rgba(57, 255, 20, 0.5);
+            animation: pulse 2s ease-in-out infinite;
+        }
+        @keyframes pulse {
+            0%, 100% { box-shadow: 0 0 15px rgba(57, 255, 20, 0.5); }
+            50% { box-shadow: 0 0 30px rgba(57, 255, 20, 0.8); }
+        }
+        .connected { 
+            color: #00FF00;
+            text-shadow: 0 0 10px #00FF00;
+        }
+        .error { 
+            color: #FF0000;
+            text-shadow: 0 0 10px #FF0000;
+        }
+        .icon {
+            font-size: 48px;
+            margin: 20px 0;
+            animation: rotate 3s linear infinite;
+        }
+        @keyframes rotate {
+            from { transform: rotate(0deg); }
+            to { transform: rotate(360deg); }
+        }
+    </style>
+</head>
+<body>
+    <div class="icon">🎤</div>
+    <div id="status">🔄 ESTABLISHING SECURE CONNECTION...</div>
+    
+    <script>
+        const statusEl = document.getElementById('status');
+        
+        async function startCall() {
+            try {
+                // Voice-only room: no simulcast/adaptive video logic, Opus tuned for speech
+                const room = new LivekitClient.Room({
+                    adaptiveStream: false,
+                    dynacast: false,
+                    audioCaptureDefaults: {
+                        echoCancellation: true,
+                        noiseSuppression: true,
+                        autoGainControl: true,
+                        channelCount: 1,
+                        sampleRate: 16000,
+                    },
+                    publishDefaults: {
+                        audioPreset: LivekitClient.AudioPresets.speech,
+                        dtx: true,
+                        red: true,
+                        stopMicTrackOnMute: true,
+                    },
+                });
+                
+                // Handle incoming audio (agent voice)
+                room.on(LivekitClient.RoomEvent.TrackSubscribed, (track, publication, participant) => {
+                    console.log('Track subscribed:', track.kind, participant.identity);
+                    if (track.kind === LivekitClient.Track.Kind.Audio) {
+                        const audioElement = track.attach();
+                        document.body.appendChild(audioElement);
+                        audioElement.play();
+                        console.log('🔊 Agent audio active');
+                    }
+                });
+                
+                // Connect to room
+                await room.connect("$url", "$token");
+                statusEl.innerHTML = "🟢 VOICE LINK ACTIVE<br><small>Speak clearly into your microphone</small>";
+                statusEl.className = "connected";
+                
+                // Enable microphone
+                await room.localParticipant.setMicrophoneEnabled(true);
+                console.log('🎤 Microphone enabled');
+                
+            } catch (error) {
+                console.error('Connection error:', error);
+                statusEl.textContent = "❌ CONNECTION FAILED: " + error.message;
+                statusEl.className = "error";
+            }
+        }
+        
+        startCall();
+    </script>
+</body>
+</html>
+""")
+
+@functools.lru_cache(maxsize=1)
+def _render_livekit_html(url, token):
+    return _LIVEKIT_HTML.substitute(url=url, token=token)
+
+def get_session_token():
+    """Browser LiveKit token, fetched once per call rather than on every rerun."""
+    token_data = st.session_state.get('_lk_token')
+    if not token_data:
+        token_data = manager.voice_bridge.get_token()
+        st.session_state._lk_token = token_data
+    return token_data
+
 def start_call():
     """Start voice bridge connection"""
     bridge = manager.voice_bridge
+    fut = st.session_state.get('_livekit_fut')
     
-    if not getattr(bridge, 'active', False):
+    if not getattr(bridge, 'active', False) and not (fut and not fut.done()):
         st.session_state.call_active = True
         bridge.active = True
         
-        def run_livekit(man):
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(man.voice_bridge.connect_and_stream())
-            except Exception as e:
-                print(f"LiveKit Thread Error: {e}")
-
-        # Start background thread for Python listener
-        thread = threading.Thread(target=run_livekit, args=(manager,), daemon=True)
-        thread.start()
-    
-    st.rerun()
+        # Schedule the Python listener on the shared background loop
+        st.session_state._livekit_fut = asyncio.run_coroutine_threadsafe(
+            bridge.connect_and_stream(), get_event_loop()
+        )
 
 def stop_call():
     """Stop voice bridge connection"""
     st.session_state.call_active = False
+    st.session_state.pop('_lk_token', None)
     if manager.voice_bridge:
         manager.voice_bridge.active = False
-    st.rerun()
+    # Cancelling runs connect_and_stream's cleanup (close) on the loop
+    fut = st.session_state.get('_livekit_fut')
+    if fut and not fut.done():
+        fut.cancel()
 
 def main():
     # Header
@@ -129,12 +260,11 @@ def main():
         backend_connected = bridge and bridge.room and bridge.room.connection_state
         
         # Control Buttons
+        # on_click runs before the rerun, so no explicit st.rerun() is needed
         if not st.session_state.get('call_active', False):
-            if st.button("📞 ACTIVATE VOICE LINK", type="primary", use_container_width=True):
-                start_call()
+            st.button("📞 ACTIVATE VOICE LINK", type="primary", use_container_width=True, on_click=start_call)
         else:
-            if st.button("⏹️ TERMINATE SESSION", type="secondary", use_container_width=True):
-                stop_call()
+            st.button("⏹️ TERMINATE SESSION", type="secondary", use_container_width=True, on_click=stop_call)
 
         st.markdown("---")
         
@@ -155,9 +285,7 @@ def main():
         # System Controls
         st.markdown("### ⚙️ CONTROLS")
         
-        if st.button("🗑️ CLEAR LOGS", use_container_width=True):
-            manager.history = []
-            st.rerun()
+        st.button("🗑️ CLEAR LOGS", use_container_width=True, on_click=manager.clear_history)
         
         # System Info
         st.markdown("---")
@@ -171,103 +299,10 @@ def main():
     
     # Voice Bridge Client (Browser Audio)
     if st.session_state.get('call_active', False):
-        token_data = manager.voice_bridge.get_token()
+        token_data = get_session_token()
         
         if token_data:
-            html_code = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <script src="https://cdn.jsdelivr.net/npm/livekit-client@2/dist/livekit-client.umd.min.js"></script>
-                <style>
-                    body {{ 
-                        font-family: 'Courier New', monospace; 
-                        text-align: center; 
-                        padding: 30px; 
-                        background: linear-gradient(135deg, #001400 0%, #002800 100%);
-                        color: #39FF14;
-                        margin: 0;
-                    }}
-                    #status {{ 
-                        font-size: 22px; 
-                        font-weight: bold; 
-                        margin: 20px 0;
-                        padding: 20px;
-                        border: 3px solid #39FF14;
-                        border-radius: 15px;
-                        background: rgba(0, 50, 0, 0.5);
-                        box-shadow: 0 0 25px rgba(57, 255, 20, 0.5);
-                        animation: pulse 2s ease-in-out infinite;
-                    }}
-                    @keyframes pulse {{
-                        0%, 100% {{ box-shadow: 0 0 15px rgba(57, 255, 20, 0.5); }}
-                        50% {{ box-shadow: 0 0 30px rgba(57, 255, 20, 0.8); }}
-                    }}
-                    .connected {{ 
-                        color: #00FF00;
-                        text-shadow: 0 0 10px #00FF00;
-                    }}
-                    .error {{ 
-                        color: #FF0000;
-                        text-shadow: 0 0 10px #FF0000;
-                    }}
-                    .icon {{
-                        font-size: 48px;
-                        margin: 20px 0;
-                        animation: rotate 3s linear infinite;
-                    }}
-                    @keyframes rotate {{
-                        from {{ transform: rotate(0deg); }}
-                        to {{ transform: rotate(360deg); }}
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="icon">🎤</div>
-                <div id="status">🔄 ESTABLISHING SECURE CONNECTION...</div>
-                
-                <script>
-                    const statusEl = document.getElementById('status');
-                    
-                    async function startCall() {{
-                        try {{
-                            const room = new LivekitClient.Room({{
-                                adaptiveStream: true,
-                                dynacast: true,
-                            }});
-                            
-                            // Handle incoming audio (agent voice)
-                            room.on(LivekitClient.RoomEvent.TrackSubscribed, (track, publication, participant) => {{
-                                console.log('Track subscribed:', track.kind, participant.identity);
-                                if (track.kind === LivekitClient.Track.Kind.Audio) {{
-                                    const audioElement = track.attach();
-                                    document.body.appendChild(audioElement);
-                                    audioElement.play();
-                                    console.log('🔊 Agent audio active');
-                                }}
-                            }});
-                            
-                            // Connect to room
-                            await room.connect("{token_data['livekit_url']}", "{token_data['token']}");
-                            statusEl.innerHTML = "🟢 VOICE LINK ACTIVE<br><small>Speak clearly into your microphone</small>";
-                            statusEl.className = "connected";
-                            
-                            // Enable microphone
-                            await room.localParticipant.setMicrophoneEnabled(true);
-                            console.log('🎤 Microphone enabled');
-                            
-                        }} catch (error) {{
-                            console.error('Connection error:', error);
-                            statusEl.textContent = "❌ CONNECTION FAILED: " + error.message;
-                            statusEl.className = "error";
-                        }}
-                    }}
-                    
-                    startCall();
-                </script>
-            </body>
-            </html>
-            """
+            html_code = _render_livekit_html(token_data['livekit_url'], token_data['token'])
             
             components.html(html_code, height=300)
         else:
@@ -279,7 +314,14 @@ def main():
     st.markdown("---")
     st.markdown("### 📋 CONVERSATION LOG")
     
-    history = manager.history
+    # Poll only while a call can add messages; otherwise the log redraws with the page
+    refresh = LOG_REFRESH if st.session_state.get('call_active', False) else None
+    st.fragment(_render_log, run_every=refresh)()
+
+def _render_log():
+    """Conversation log; as a fragment it refreshes without re-running the whole page."""
+    # Snapshot the tail: the deque is appended to from the LiveKit loop thread
+    history = list(manager.history)[-LOG_TAIL:]
     chat_container = st.container(height=400)
     
     with chat_container:
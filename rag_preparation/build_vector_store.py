@@ -1,13 +1,61 @@
+import os
 import json
+import tempfile
 import faiss
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 import pickle
+import zstandard as zstd
+
+HNSW_MAX_DOCS = 10000 # Above this, switch to a trained IVF-PQ index
+ENCODE_BATCH = 256
+ADD_BATCH = 4096 # Rows up-cast to fp32 at a time when feeding FAISS
+
+def _build_index(vectors):
+    """
+    Sub-linear inner-product index: fp16 HNSW graph for small corpora, IVF-PQ beyond that.
+    vectors is an (n, d) fp16 array (typically a memmap); it is up-cast to fp32 in batches.
+    """
+    n, dimension = vectors.shape
+    if n < HNSW_MAX_DOCS:
+        # fp16 scalar-quantised storage halves the index; search quality is unchanged in practice
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = 64
+        train_size = n
+    else:
+        nlist = min(4096, 4 * int(n ** 0.5))
+        quantizer = faiss.IndexFlatIP(dimension)
+        # 32 sub-quantizers x 8 bits (dimension must be divisible by 32, e.g. 384 for MiniLM)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, 32, 8, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = 16
+        train_size = min(n, max(64 * nlist, HNSW_MAX_DOCS))
+    if train_size < n:
+        # Uniform sample, not a prefix: documents are grouped by source protocol
+        rows = np.sort(np.random.default_rng().choice(n, train_size, replace=False))
+        index.train(np.asarray(vectors[rows], dtype='float32'))
+    else:
+        index.train(np.asarray(vectors, dtype='float32'))
+    for i in range(0, n, ADD_BATCH):
+        index.add(np.asarray(vectors[i:i + ADD_BATCH], dtype='float32'))
+    return index
+
+def save_metadata(metadata, metadata_file):
+    """Pickles metadata (protocol 5) through a zstd stream."""
+    with open(metadata_file, "wb") as f:
+        with zstd.ZstdCompressor(level=3).stream_writer(f) as w:
+            pickle.dump(metadata, w, protocol=5)
+
+def load_metadata(metadata_file):
+    """Inverse of save_metadata."""
+    with open(metadata_file, "rb") as f:
+        with zstd.ZstdDecompressor().stream_reader(f) as r:
+            return pickle.load(r)
 
 def build_and_save_index():
-    import os
     index_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "savant_vector.index")
-    metadata_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "savant_metadata.pkl")
+    metadata_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "savant_metadata.pkl.zst")
     protocols_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "savant_protocols.json")
 
     # 1. Load the structured protocols we just scraped
@@ -26,18 +74,37 @@ def build_and_save_index():
 
     # 3. Generate Embeddings (Local Model - Fast & Free)
     print("Loading embedding model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2') 
-    embeddings = model.encode(documents)
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+    if device == 'cuda':
+        model.half() # fp16 halves memory traffic on the GPU
+    # Unit-norm vectors (inner product == cosine similarity), written batch by batch
+    # into a scratch fp16 memmap so the full fp32 matrix never exists in RAM.
+    # The index keeps its own fp16 copy, so the scratch file is removed once built.
+    n, dimension = len(documents), model.get_sentence_embedding_dimension()
+    fd, vectors_file = tempfile.mkstemp(suffix=".vec", dir=os.path.dirname(index_file))
+    os.close(fd)
+    try:
+        vectors = np.memmap(vectors_file, dtype='float16', mode='w+', shape=(n, dimension))
+        for i in range(0, n, ENCODE_BATCH):
+            vectors[i:i + ENCODE_BATCH] = model.encode(
+                documents[i:i + ENCODE_BATCH],
+                batch_size=ENCODE_BATCH,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        vectors.flush()
 
-    # 4. Create FAISS Index
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings).astype('float32'))
+        # 4. Create FAISS Index
+        index = _build_index(vectors)
+        del vectors # Release the mapping before unlinking (required on Windows)
+    finally:
+        os.remove(vectors_file)
 
     # 5. SAVE to Disk (The Hand-off)
     faiss.write_index(index, index_file)
-    with open(metadata_file, "wb") as f:
-        pickle.dump(metadata, f)
+    save_metadata(metadata, metadata_file)
     
     print("Vector Store Built & Saved: savant_vector.index")
 
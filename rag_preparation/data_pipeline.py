@@ -1,8 +1,17 @@
 import os
+import re
 import json
+import orjson
+import asyncio
+import hashlib
 import requests
 import logging
+import tiktoken
 from io import BytesIO
+from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pypdf import PdfReader
 
 # Configure logging
@@ -16,40 +25,96 @@ PROTOCOL_URLS = {
 
 OUTPUT_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "savant_protocols.json")
 
+# Shared keep-alive pool so concurrent downloads keep TLS sessions warm
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504))
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+# Body of the first markdown code fence (any language tag, closing fence optional);
+# replies without fences are used as-is
+_FENCE_RE = re.compile(r"```[A-Za-z]*\s*(.*?)(?:```|\Z)", re.S)
+
+DOWNLOAD_TIMEOUT = (3, 30) # (connect, read) seconds
+DOWNLOAD_CHUNK = 1 << 16
+
 def download_pdf(url: str) -> BytesIO:
     """Downloads a PDF from a URL into memory."""
     try:
         logging.info(f"Downloading protocol from: {url}")
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return BytesIO(response.content)
+        # Stream straight into the buffer instead of holding response.content and a copy
+        buf = BytesIO()
+        with _SESSION.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                buf.write(chunk)
+        buf.seek(0)
+        return buf
     except Exception as e:
         logging.error(f"Failed to download {url}: {e}")
         return None
 
+def iter_pdf_pages(pdf_stream: BytesIO):
+    """Yields the text of each page of a PDF stream."""
+    reader = PdfReader(pdf_stream)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
 def extract_text_from_pdf(pdf_stream: BytesIO) -> str:
     """Extracts raw text from a PDF stream."""
     if not pdf_stream:
         return ""
     try:
-        reader = PdfReader(pdf_stream)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        parts = []
+        for page_text in iter_pdf_pages(pdf_stream):
+            parts.append(page_text)
+            parts.append("\n")
+        return "".join(parts)
     except Exception as e:
         logging.error(f"Failed to extract text: {e}")
         return ""
 
-from openai import OpenAI
+CHUNK_TOKENS = 6000 # Fits comfortably in the extraction model's context with the prompt
+OVERLAP_TOKENS = 200
+
+def iter_token_chunks(texts: Iterable[str], chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = OVERLAP_TOKENS):
+    """
+    Slides a token window across a stream of text pieces (pages, documents), yielding
+    chunks of exactly chunk_tokens tokens (the last may be shorter), each overlapping
+    the previous one by overlap_tokens. Only the unconsumed tail of the window is kept.
+    """
+    enc = tiktoken.get_encoding("cl100k_base")
+    step = chunk_tokens - overlap_tokens
+    window = []
+    covered = 0 # Leading tokens of window already sent in a previous chunk
+    for piece in texts:
+        window.extend(enc.encode(piece, disallowed_special=()))
+        start = 0
+        while len(window) - start >= chunk_tokens:
+            yield enc.decode(window[start:start + chunk_tokens])
+            start += step
+            covered = overlap_tokens
+        # Trim once per piece, so a single huge piece is still consumed in linear time
+        del window[:start]
+    if len(window) > covered:
+        yield enc.decode(window)
+
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def process_text_into_protocols(raw_text: str) -> dict:
+LLM_CONCURRENCY = 8 # In-flight chunk requests (provider rate limits)
+
+async def process_text_into_protocols(texts: Iterable[str]) -> dict:
     """
     Uses an LLM (NVIDIA Nemotron via OpenAI client) to extract a decision tree from raw text.
-    Processes text in chunks to handle large documents.
+    texts is an iterable of text pieces (e.g. one per PDF), chunked as a single stream;
+    chunks are sent concurrently.
     """
     logging.info("Processing extracted text into decision tree structures using LLM...")
     
@@ -58,16 +123,25 @@ def process_text_into_protocols(raw_text: str) -> dict:
         logging.warning("NIM_API_KEY not found. Using generic placeholder data.")
         return get_placeholder_data()
 
-    client = OpenAI(
+    client = AsyncOpenAI(
         base_url="https://integrate.api.nvidia.com/v1",
         api_key=api_key
     )
 
-    CHUNK_SIZE = 15000
-    overlap = 500
-    chunks = [raw_text[i:i+CHUNK_SIZE] for i in range(0, len(raw_text), CHUNK_SIZE - overlap)]
+    if isinstance(texts, str):
+        texts = (texts,) # A single document, not an iterable of characters
+
+    # Identical chunks (e.g. the same guideline pages in two PDFs) only need one LLM call
+    chunks = []
+    seen = set()
+    for chunk in iter_token_chunks(texts):
+        digest = hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).digest()
+        if digest not in seen:
+            seen.add(digest)
+            chunks.append(chunk)
     
-    all_protocols = []
+    # Deduplicate protocols by ID as results arrive (later chunks win, as before)
+    unique_protocols = {} # id -> (chunk index, protocol)
     
     logging.info(f"Split text into {len(chunks)} chunks for processing.")
 
@@ -98,10 +172,12 @@ def process_text_into_protocols(raw_text: str) -> dict:
     Keep instructions direct and imperative (Dr. Shaun Murphy persona).
     """
 
-    for i, chunk in enumerate(chunks):
-        logging.info(f"Processing chunk {i+1}/{len(chunks)}...")
-        try:
-            response = client.chat.completions.create(
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def extract_one(i, chunk):
+        async with sem:
+            logging.info(f"Processing chunk {i+1}/{len(chunks)}...")
+            response = await client.chat.completions.create(
                 model="nvidia/nemotron-3-nano-30b-a3b",
                 messages=[
                     {"role": "system", "content": prompt},
@@ -112,33 +188,36 @@ def process_text_into_protocols(raw_text: str) -> dict:
                 max_tokens=4096,
                 stream=False
             )
-            
-            content = response.choices[0].message.content
-            # Clean up markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            chunk_data = json.loads(content)
-            if "protocols" in chunk_data and isinstance(chunk_data["protocols"], list):
-                all_protocols.extend(chunk_data["protocols"])
-            
-        except Exception as e:
-            logging.error(f"LLM Extraction failed for chunk {i+1}: {e}")
-            continue
-
-    if not all_protocols:
+        
+        content = response.choices[0].message.content
+        # Clean up markdown code blocks if present
+        m = _FENCE_RE.search(content)
+        content = m.group(1).strip() if m else content.strip()
+
+        chunk_data = orjson.loads(content)
+        if not isinstance(chunk_data, dict) or not isinstance(chunk_data.get("protocols"), list):
+            return
+        for p in chunk_data["protocols"]:
+            if isinstance(p, dict) and "id" in p:
+                prev = unique_protocols.get(p["id"])
+                if prev is None or prev[0] <= i:
+                    unique_protocols[p["id"]] = (i, p)
+
+    async with client:
+        results = await asyncio.gather(
+            *(extract_one(i, chunk) for i, chunk in enumerate(chunks)),
+            return_exceptions=True
+        )
+
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logging.error(f"LLM Extraction failed for chunk {i+1}: {result}")
+
+    if not unique_protocols:
         logging.warning("No protocols extracted from any chunk. Using placeholder.")
         return get_placeholder_data()
 
-    # Deduplicate protocols by ID (simple merge strategy)
-    unique_protocols = {}
-    for p in all_protocols:
-        if "id" in p:
-            unique_protocols[p["id"]] = p
-            
-    return {"protocols": list(unique_protocols.values())}
+    return {"protocols": [p for _, p in unique_protocols.values()]}
 
 def get_placeholder_data():
     """Fallback data if LLM fails or no key."""
@@ -175,23 +254,26 @@ def get_placeholder_data():
     }
 
 def main():
-    all_text = ""
     
     # 1. Download and Extract
     # Note: We attempt download, but if it fails (offline/link rot), 
     # we proceed with empty text to ensure the JSON structure is generated for the demo.
-    for name, url in PROTOCOL_URLS.items():
-        pdf_stream = download_pdf(url)
+    # Downloads are IO-bound, so fetch every protocol concurrently.
+    # pypdf spends much of its time in zlib (GIL released), so extraction is pooled too.
+    with ThreadPoolExecutor(max_workers=len(PROTOCOL_URLS)) as pool:
+        pdf_streams = list(pool.map(download_pdf, PROTOCOL_URLS.values()))
+        texts = list(pool.map(extract_text_from_pdf, pdf_streams))
+
+    for name, pdf_stream, text in zip(PROTOCOL_URLS, pdf_streams, texts):
         if pdf_stream:
-            text = extract_text_from_pdf(pdf_stream)
-            all_text += text
             logging.info(f"Extracted {len(text)} characters from {name}")
         else:
             logging.warning(f"Skipping download for {name}, proceeding with synthetic generation.")
 
     # 2. Process into Decision Tree
     # Even if download fails, we generate the critical protocol JSON for the agent to function.
-    savant_protocols = process_text_into_protocols(all_text)
+    # The per-PDF texts are chunked as one stream, never joined into a single string.
+    savant_protocols = asyncio.run(process_text_into_protocols(texts))
 
     # 3. Save
     with open(OUTPUT_FILE, 'w') as f:
@@ -6,6 +6,8 @@ import streamlit as st
 import streamlit.components.v1 as components
 import requests
 import os
+import string
+import functools
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,7 +19,15 @@ st.set_page_config(
 )
 
 def get_livekit_token():
-    """Fetch LiveKit token from VocalBridge API"""
+    """Fetch LiveKit token from VocalBridge API (memoized for the current call)"""
+    token_data = st.session_state.get('_lk_token')
+    if token_data:
+        return token_data
+    token_data = _fetch_livekit_token()
+    st.session_state._lk_token = token_data
+    return token_data
+
+def _fetch_livekit_token():
     api_key = os.getenv('VOCAL_BRIDGE_KEY')
     api_url = os.getenv('VOCAL_BRIDGE_URL', 'https://vocalbridgeai.com')
     
@@ -37,6 +47,92 @@ def get_livekit_token():
         st.error(f"Failed to get token: {e}")
         return None
 
+# LiveKit browser client, templated once. Identical markup across reruns lets
+# Streamlit keep the existing iframe (and its WebRTC session) mounted.
+_LIVEKIT_HTML = string.Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <script src="https://cdn.jsdelivr.net/npm/livekit-client@2/dist/livekit-client.umd.min.js"></script>
+    <style>
+        body { font-family: Arial; text-align: center; padding: 20px; }
+        #status { font-size: 18px; font-weight: bold; margin: 20px 0; }
+        .connected { color: green; }
+        .error { color: red; }
+    </style>
+</head>
+<body>
+    <div id="status">Connecting...</div>
+    <div id="transcript" style="margin-top: 20px; font-size: 14px;"></div>
+    
+    <script>
+        const statusEl = document.getElementById('status');
+        const transcriptEl = document.getElementById('transcript');
+        
+        async function startCall() {
+            try {
+                // Voice-only room: no simulcast/adaptive video logic, Opus tuned for speech
+                const room = new LivekitClient.Room({
+                    adaptiveStream: false,
+                    dynacast: false,
+                    audioCaptureDefaults: {
+                        echoCancellation: true,
+                        noiseSuppression: true,
+                        autoGainControl: true,
+                        channelCount: 1,
+                        sampleRate: 16000,
+                    },
+                    publishDefaults: {
+                        audioPreset: LivekitClient.AudioPresets.speech,
+                        dtx: true,
+                        red: true,
+                        stopMicTrackOnMute: true,
+                    },
+                });
+                
+                // Handle incoming audio tracks (agent voice)
+                room.on(LivekitClient.RoomEvent.TrackSubscribed, (track, publication, participant) => {
+                    console.log('Track subscribed:', track.kind);
+                    if (track.kind === LivekitClient.Track.Kind.Audio) {
+                        const audioElement = track.attach();
+                        document.body.appendChild(audioElement);
+                        audioElement.play();
+                        console.log('Agent audio playing');
+                    }
+                });
+                
+                // Handle transcriptions
+                room.on(LivekitClient.RoomEvent.TranscriptionReceived, (transcription) => {
+                    console.log('Transcription:', transcription);
+                    const text = transcription.segments.map(s => s.text).join(' ');
+                    transcriptEl.innerHTML += `<p>$${text}</p>`;
+                });
+                
+                // Connect
+                await room.connect("$url", "$token");
+                statusEl.textContent = "🟢 Connected - Speak Now";
+                statusEl.className = "connected";
+                
+                // Enable microphone
+                await room.localParticipant.setMicrophoneEnabled(true);
+                
+            } catch (error) {
+                console.error('Connection error:', error);
+                statusEl.textContent = "❌ Connection Failed: " + error.message;
+                statusEl.className = "error";
+            }
+        }
+        
+        startCall();
+    </script>
+</body>
+</html>
+""")
+
+@functools.lru_cache(maxsize=1)
+def _render_livekit_html(url, token):
+    return _LIVEKIT_HTML.substitute(url=url, token=token)
+
 def main():
     st.title("🎯 THE SAVANT")
     
@@ -50,6 +146,7 @@ def main():
         if st.session_state.get('call_active', False):
             if st.button("⏹️ END CALL", type="secondary"):
                 st.session_state.call_active = False
+                st.session_state.pop('_lk_token', None)
                 st.rerun()
     
     # Main Interface  
@@ -58,71 +155,7 @@ def main():
         
         if token_data:
             # Embed LiveKit JS Client
-            html_code = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <script src="https://cdn.jsdelivr.net/npm/livekit-client@2/dist/livekit-client.umd.min.js"></script>
-                <style>
-                    body {{ font-family: Arial; text-align: center; padding: 20px; }}
-                    #status {{ font-size: 18px; font-weight: bold; margin: 20px 0; }}
-                    .connected {{ color: green; }}
-                    .error {{ color: red; }}
-                </style>
-            </head>
-            <body>
-                <div id="status">Connecting...</div>
-                <div id="transcript" style="margin-top: 20px; font-size: 14px;"></div>
-                
-                <script>
-                    const statusEl = document.getElementById('status');
-                    const transcriptEl = document.getElementById('transcript');
-                    
-                    async function startCall() {{
-                        try {{
-                            const room = new LivekitClient.Room({{
-                                adaptiveStream: true,
-                                dynacast: true,
-                            }});
-                            
-                            // Handle incoming audio tracks (agent voice)
-                            room.on(LivekitClient.RoomEvent.TrackSubscribed, (track, publication, participant) => {{
-                                console.log('Track subscribed:', track.kind);
-                                if (track.kind === LivekitClient.Track.Kind.Audio) {{
-                                    const audioElement = track.attach();
-                                    document.body.appendChild(audioElement);
-                                    audioElement.play();
-                                    console.log('Agent audio playing');
-                                }}
-                            }});
-                            
-                            // Handle transcriptions
-                            room.on(LivekitClient.RoomEvent.TranscriptionReceived, (transcription) => {{
-                                console.log('Transcription:', transcription);
-                                const text = transcription.segments.map(s => s.text).join(' ');
-                                transcriptEl.innerHTML += `<p>${{text}}</p>`;
-                            }});
-                            
-                            // Connect
-                            await room.connect("{token_data['livekit_url']}", "{token_data['token']}");
-                            statusEl.textContent = "🟢 Connected - Speak Now";
-                            statusEl.className = "connected";
-                            
-                            // Enable microphone
-                            await room.localParticipant.setMicrophoneEnabled(true);
-                            
-                        }} catch (error) {{
-                            console.error('Connection error:', error);
-                            statusEl.textContent = "❌ Connection Failed: " + error.message;
-                            statusEl.className = "error";
-                        }}
-                    }}
-                    
-                    startCall();
-                </script>
-            </body>
-            </html>
-            """
+            html_code = _render_livekit_html(token_data['livekit_url'], token_data['token'])
             
             components.html(html_code, height=400)
         else: